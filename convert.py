@@ -2,25 +2,114 @@
 # Maps a given list of company names to their website domain names
 # Add downweighting for companies with non-www starting
 ########################################################################################### 
+import os
 import urllib
-import json as m_json
-from urlparse import urlparse
-import enchant
-import testData
-import sys
+import httplib
+import socket
+import threading
+import re
+import string
+from operator import itemgetter
+# ujson parses the search responses several times faster when it's installed
+try:
+    import ujson as m_json
+except ImportError:
+    import json as m_json
+from collections import namedtuple
+from functools import wraps
+from multiprocessing.pool import ThreadPool
 
 URL_COUNT_WEIGHT = .25 
 URL_ORDER_WEIGHT = -.25
 URL_LEN_WEIGHT = -.1
 
-ENGLISH_DICT = enchant.Dict("en_US")
-TRIVIAL_WORDS = ["company", "inc", "group", "corporation", "co", "corp", "university", "college", "&", "llc", "the", "of", "a", "an"]
+SEARCH_HOST = 'ajax.googleapis.com'
+SEARCH_PATH = '/ajax/services/search/web?v=1.0&'
+# every query thread keeps its own connection to SEARCH_HOST open between queries
+SEARCH_CONNECTIONS = threading.local()
+# number of search queries allowed in flight at once, they're all blocked on the network so it can be well above the core count
+QUERY_THREAD_COUNT = int(os.environ.get("QUERY_THREAD_COUNT", 50))
+# worker threads shared by every getQuery2URLS call, so their search connections outlive a single batch
+QUERY_POOL = None
+# search results already fetched this run, keyed by query
+QUERY_CACHE = {}
+
+# Every lowercase word form the hunspell en_US dictionary accepts (SCOWL, the one enchant checks en_US against), one per line
+ENGLISH_WORDS_PATH = "words.txt"
+# the words in ENGLISH_WORDS_PATH, read the first time a word is checked
+ENGLISH_WORDS = None
+# numbers and ordinals a spell checker accepts without listing them: 42, 1-800, 11th, 21st, 102nd
+NUMBER_RE = re.compile(r"\d+(?:-\d+)*$|\d*1\dth$|(?:\d*[02-9])?(?:0th|1st|2nd|3rd|[4-9]th)$")
+# punctuation stripped from company names before matching
+COMPANY_PUNCTUATION = ".,"
+# unicode.translate takes a mapping rather than a deletechars string
+UNICODE_PUNCTUATION_TABLE = dict((ord(c), None) for c in COMPANY_PUNCTUATION)
+# host part of a url, the optional scheme is skipped and it runs up to the path, query or fragment
+URL_NETLOC_RE = re.compile(r"(?:[^:/?#]*://)?([^/?#]*)")
+TRIVIAL_WORDS = frozenset(["company", "inc", "group", "corporation", "co", "corp", "university", "college", "&", "llc", "the", "of", "a", "an"])
+
+# What getBestURL found for a company: the domain, how confident the match is, and which rule matched
+BestURL = namedtuple("BestURL", ["url", "confidence", "reason"])
+
+# Caches results by argument, the same words, names and urls come up over and over across a training run
+# Only use on functions of hashable arguments that return immutable values
+def memoize(f):
+    cache = {}
+    @wraps(f)
+    def memoized(*args):
+        try:
+            return cache[args]
+        except KeyError:
+            result = cache[args] = f(*args)
+            return result
+    return memoized
+
+def getEnglishWords():
+    global ENGLISH_WORDS
+    if ENGLISH_WORDS is None:
+        try:
+            with open(ENGLISH_WORDS_PATH) as f:
+                ENGLISH_WORDS = frozenset(line.strip() for line in f)
+        except IOError as e:
+            raise IOError("Couldn't read the English word list at ENGLISH_WORDS_PATH (%s): %s" % (ENGLISH_WORDS_PATH, e.strerror))
+    return ENGLISH_WORDS
+
+# Whether a lowercased token is an English word, the way a spell checker would answer it
+# A hyphenated token counts when every piece of it does (well-known, e-commerce)
+@memoize
+def isEnglishWord(word):
+    if word in getEnglishWords() or NUMBER_RE.match(word):
+        return True
+    return "-" in word and all(isEnglishWord(piece) for piece in word.split("-") if piece)
+
+def getQueryPool():
+    global QUERY_POOL
+    if QUERY_POOL is None:
+        QUERY_POOL = ThreadPool(QUERY_THREAD_COUNT)
+    return QUERY_POOL
+
+def getSearchConnection():
+    connection = getattr(SEARCH_CONNECTIONS, 'connection', None)
+    if connection is None:
+        connection = SEARCH_CONNECTIONS.connection = httplib.HTTPConnection(SEARCH_HOST)
+    return connection
+
+def getSearchResponse(path):
+    connection = getSearchConnection()
+    try:
+        connection.request('GET', path)
+        return connection.getresponse().read()
+    except (httplib.HTTPException, socket.error):
+        # the server may have dropped the kept-alive connection, retry once on a fresh one
+        connection.close()
+        connection.request('GET', path)
+        return connection.getresponse().read()
 
 # Code adapted from http://stackoverflow.com/questions/3898574/google-search-using-python-script #
 # Assume Q is a list of unique strings
 def getURLForQuery(q, query2URLS):
     query = urllib.urlencode ( { 'q' : q } )
-    response = urllib.urlopen ( 'http://ajax.googleapis.com/ajax/services/search/web?v=1.0&' + query ).read()
+    response = getSearchResponse ( SEARCH_PATH + query )
     json = m_json.loads ( response )
     results = json [ 'responseData' ] [ 'results' ]
     URLS = []
@@ -30,13 +119,16 @@ def getURLForQuery(q, query2URLS):
         URLS.append(url)
     query2URLS[q] = URLS
 
+# Same as urlparse(url).netloc for the absolute urls search returns, without building the whole parse result
+@memoize
 def simplifyURL(url):
-    return urlparse(url).netloc
+    return URL_NETLOC_RE.match(url).group(1)
 
-# Returns a list of the words in name of the company in descending order of "importance"
+# Returns the words (lowercased tokens) of the company name (as tuples) in descending order of "importance"
 # Do it by length, if a word is in the dictionary, and put unimportnat words like "of" "the" "llc" at the end
-def arrangeWordsByImportance(company):
-    lst = sorted(company.lower().split(), key=lambda x: len(x), reverse=True)
+@memoize
+def arrangeWordsByImportance(tokens):
+    lst = sorted(tokens, key=len, reverse=True)
     nonwords = []
     others = []
     for word in lst:
@@ -44,76 +136,95 @@ def arrangeWordsByImportance(company):
         if word in TRIVIAL_WORDS:
             continue
         # Marks words that aren't trivial and aren't in dictionary as more important
-        elif not ENGLISH_DICT.check(word):
+        elif not isEnglishWord(word):
             nonwords.append(word)
         else:
             others.append(word)
-    return (nonwords, others)
+    return (tuple(nonwords), tuple(others))
+
+# One pattern matching any of the given words, for a single yes/no search of a domain
+@memoize
+def getWordsPattern(words):
+    return re.compile("|".join(re.escape(word) for word in words))
 
 def getRankedURLSLst(urls):
     # store the rank of each url, rank is a linear combination of count, len of url, and order
     rankedURLSDict = {}
-    min_url_rank = sys.maxint
-    max_url_rank = -sys.maxint
-    for i, url in enumerate(urls):
-        simpleURL = simplifyURL(url)
+    # a url's rank only grows after it first shows up, so the smallest rank ever seen is among these
+    firstRanks = []
+    for i, simpleURL in enumerate(map(simplifyURL, urls)):
         if simpleURL in rankedURLSDict:
-            rankedURLSDict[simpleURL] = rankedURLSDict[simpleURL] + URL_COUNT_WEIGHT
+            rankedURLSDict[simpleURL] += URL_COUNT_WEIGHT
         else:
-            domainArr = simpleURL.split(".")
+            # only need to know whether there are exactly three labels, so stop splitting after that
+            domainArr = simpleURL.split(".", 3)
             urlSize = len(domainArr[1]) if len(domainArr) == 3 else len(domainArr[0])
-            rankedURLSDict[simpleURL] = URL_COUNT_WEIGHT + URL_ORDER_WEIGHT*(i+1) + URL_LEN_WEIGHT*urlSize
-        min_url_rank = min_url_rank if rankedURLSDict[simpleURL] > min_url_rank else rankedURLSDict[simpleURL]
-        max_url_rank = max_url_rank if rankedURLSDict[simpleURL] < max_url_rank else rankedURLSDict[simpleURL]
+            rank = URL_COUNT_WEIGHT + URL_ORDER_WEIGHT*(i+1) + URL_LEN_WEIGHT*urlSize
+            rankedURLSDict[simpleURL] = rank
+            firstRanks.append(rank)
+    if not rankedURLSDict:
+        return []
+    min_url_rank = min(firstRanks)
+    max_url_rank = max(rankedURLSDict.itervalues())
     # rank by linear combination of count, len of url, and order it appears and normalize all values to be in [0, 1]
     divisor_for_url_rank = max_url_rank if max_url_rank - min_url_rank == 0 else max_url_rank - min_url_rank 
-    return sorted([(k, float(rankedURLSDict[k] - min_url_rank) / divisor_for_url_rank) for k in rankedURLSDict], key=lambda x: x[1], reverse=True)
+    return sorted([(k, float(v - min_url_rank) / divisor_for_url_rank) for k, v in rankedURLSDict.iteritems()], key=itemgetter(1), reverse=True)
 
-def getCompanyAcroynms(company):
+# Takes the lowercased tokens of the company name
+@memoize
+def getCompanyAcroynms(tokens):
     allWords = [] # acroynm comprising of the first letters of all the words
     important = [] # acroynm comprising of the first letters of all the non-trival words
     # caps = [] # acroynm comprising of any word in it's entirity and the first letter of all other words
-    for word in company.split():
+    for word in tokens:
         allWords.append(word[0])
         # if word.isupper():
         #     caps.append(word)
         # else:
         #     caps.append(word[0])
-        if word.lower() not in TRIVIAL_WORDS:
+        if word not in TRIVIAL_WORDS:
             important.append(word[0])
-    return set(["".join(allWords).lower(), "".join(important).lower()]) # "".join(caps).lower()])
+    return frozenset(["".join(allWords), "".join(important)]) # "".join(caps).lower()])
 
 # Returns the correct URL or the empty string if all provided URLS don't match
 def getBestURL(company, urls):
-    company = "".join(c for c in company if c not in ('.',','))
+    if isinstance(company, unicode):
+        company = company.translate(UNICODE_PUNCTUATION_TABLE)
+    else:
+        company = company.translate(None, COMPANY_PUNCTUATION)
     rankedURLSList = getRankedURLSLst(urls)
     # for e in rankedURLSList:
     #     print e[0]
     #     print e[1]
     # print
-    nonwords, others = arrangeWordsByImportance(company)
-    companyAcroynms = getCompanyAcroynms(company)
+    # lowercase the name once, then split it once for both helpers
+    company = company.lower()
+    tokens = tuple(company.split())
+    nonwords, others = arrangeWordsByImportance(tokens)
+    companyAcroynms = getCompanyAcroynms(tokens)
+    simplifiedName = company.replace(" ", "")
     for e in rankedURLSList:
         # normalize rank of each element
         # print e
-        domainArr = e[0].split(".")
+        # only the first two labels are looked at, the rest stays joined in domainArr[2]
+        domainArr = e[0].split(".", 2)
         # include longer version
         # WARNING THIS WILL THROW AN ERROR if for some reason there isn't a dot in the domain name
         out = domainArr[0] + "." + domainArr[1]
-        if len(domainArr) >= 3:
-            out = '.'.join(domainArr[1:])
-        domain = domainArr[1] if len(domainArr) >= 3 else domainArr[0]
-        simplifiedName = company.replace(" ", "").lower()
+        if len(domainArr) == 3:
+            out = domainArr[1] + "." + domainArr[2]
+        domain = domainArr[1] if len(domainArr) == 3 else domainArr[0]
         if domain in simplifiedName or simplifiedName in domain:
-            return (out, e[1], "domain in companyName or vice versa")
+            return BestURL(out, e[1], "domain in companyName or vice versa")
         if domain in companyAcroynms:
             # print "if domain in companyAcroynms:"
-            return (out, e[1], "domain in comp acronyms")
-        for nonword in nonwords:
-            if nonword in domain or domain in nonword:
-                # print "if nonword in domain or domain in nonword:"
-                return (out, e[1]*.5, "for nonword in nonwords")
+            return BestURL(out, e[1], "domain in comp acronyms")
+        # one scan of the domain finds any nonword inside it
+        if nonwords and (getWordsPattern(nonwords).search(domain) or any(domain in nonword for nonword in nonwords)):
+            # print "if nonword in domain or domain in nonword:"
+            return BestURL(out, e[1]*.5, "for nonword in nonwords")
         # keep removing company words from name
+        # one word at a time, longest first, so removing a word can open up a match for the next one
         curr = domain
         for word in others:
             if word in curr:
@@ -123,17 +234,32 @@ def getBestURL(company, urls):
         if len(domain) <= 4:
             if len(curr) <= 1:
                 # print "if len(curr) <= 1:"
-                return (out, e[1]*.4, "domain small but match all but one character")
+                return BestURL(out, e[1]*.4, "domain small but match all but one character")
         elif len(curr) <= 4:
             # print "elif len(curr) <= 4:"
-            return (out, e[1]*.4, "domain >4 and match all but 3 characters")
+            return BestURL(out, e[1]*.4, "domain >4 and match all but 3 characters")
     return ""
 
+# Searching is network bound, so fire the queries off concurrently instead of waiting on each round trip in turn
+# Each distinct name is only searched once per run, repeats are served from QUERY_CACHE
+# companyNames can be any single-pass iterable, it's read through in the calling thread before any query starts
+# It isn't streamed into the pool: ThreadPool pulls its input from its own task thread, where an error raised by companyNames would be lost
 def getQuery2URLS(companyNames):
-    query2URLS = {}
-    for query in companyNames:
-        getURLForQuery(query, query2URLS)
-    return query2URLS
+    names = []
+    toFetch = []
+    pending = set()
+    for name in companyNames:
+        names.append(name)
+        # a name that's only punctuation or whitespace can't match anything, so skip the round trip
+        if not name.strip(COMPANY_PUNCTUATION + string.whitespace):
+            QUERY_CACHE[name] = []
+        elif name not in QUERY_CACHE and name not in pending:
+            pending.add(name)
+            toFetch.append(name)
+    # results land in QUERY_CACHE, so take completions in whatever order they finish
+    for _ in getQueryPool().imap_unordered(lambda query: getURLForQuery(query, QUERY_CACHE), toFetch):
+        pass
+    return dict((query, QUERY_CACHE[query]) for query in names)
 
 def getBestURLForName(query2URLS):
     notFound = []
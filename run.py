@@ -1,44 +1,44 @@
 import testData
 import convert
 import random
+import sys
 
 pastTrain = ['MineralTree', 'Nextera Energy', 'Oktagon Games', 'Macworld', 'Liberty Mutual', 'NeonMob', 'University of Nottingham', 'Amarillo Globe-News', 'UMMC', 'LabCorp', 'Veeva Systems', 'Red Tricycle', 'A View From My Seat', 'Sonic Electronix', 'W3 Consulting', 'WickedLocal', 'MovieTickets.com', 'Granicus', 'Rabt', 'Navvia', 'TrueAbility', 'Librato', '250ok', 'GigSky', 'Blue Jeans Network']
 
+pastTrainSet = set(pastTrain)
+
 def getTrainingSample(n):
-    # return [random.choice(testData.companyToWebsiteTrainingDictionary.keys()) for i in range(n)]
-    out = []
-    for i in range(n):
-        r = random.choice(testData.companyToWebsiteTrainingDictionary.keys())
-        while r in out or r in pastTrain:
-            r = random.choice(testData.companyToWebsiteTrainingDictionary.keys())
-        out.append(r)
-    pastTrain += out
+    # return [random.choice(testData.getTrainingDictionary().keys()) for i in range(n)]
+    # sample once from the companies not trained on yet rather than retrying random picks that collide
+    pool = [k for k in testData.getTrainingDictionary() if k not in pastTrainSet]
+    out = random.sample(pool, n)
+    pastTrain.extend(out)
+    pastTrainSet.update(out)
     return out
 
+# Builds the whole report first and writes it out in one go rather than a print per line
 def checkAndPrintTrain(outputDictionary, notFoundList, query2URLS):
+    trainingDictionary = testData.getTrainingDictionary()
     correct = 0
+    lines = []
     for k in outputDictionary:
-        print k
-        print outputDictionary[k]
-        print testData.companyToWebsiteTrainingDictionary[k]
-        if outputDictionary[k][0] == testData.companyToWebsiteTrainingDictionary[k]:
-            print "correct"
+        lines += [k, str(outputDictionary[k]), trainingDictionary[k]]
+        if outputDictionary[k].url == trainingDictionary[k]:
+            lines.append("correct")
             correct += 1
         else:
-            print "incorrect"
-        print 
-    print "total correct: " + str(correct) + " out of " + str(len(outputDictionary.keys()))
-    print
+            lines.append("incorrect")
+        lines.append("")
+    lines.append("total correct: " + str(correct) + " out of " + str(len(outputDictionary.keys())))
+    lines.append("")
     for e in notFoundList:
-        print e
-        print query2URLS[e]
-        print testData.companyToWebsiteTrainingDictionary[e]
-        print
+        lines += [e, str(query2URLS[e]), trainingDictionary[e], ""]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def printTrainingCorrectness(outputDictionary):
     correct = 0
     for k in outputDictionary:
-        if outputDictionary[k][0] == testData.companyToWebsiteTrainingDictionary[k]:
+        if outputDictionary[k].url == testData.getTrainingDictionary()[k]:
             correct += 1
     print "total correct: " + str(correct) + " out of " + str(len(outputDictionary.keys()))
 
@@ -46,11 +46,11 @@ def thresholdForTrainingSample(value, outputDictionary):
     correctMin = 1
     incorrectMax = 0
     for k in outputDictionary:
-        if outputDictionary[k][2] == value:
-            if outputDictionary[k][0] == testData.companyToWebsiteTrainingDictionary[k]:
-                correctMin = min(outputDictionary[k][1], correctMin)
+        if outputDictionary[k].reason == value:
+            if outputDictionary[k].url == testData.getTrainingDictionary()[k]:
+                correctMin = min(outputDictionary[k].confidence, correctMin)
             else:
-                incorrectMax = max(outputDictionary[k][1], incorrectMax)
+                incorrectMax = max(outputDictionary[k].confidence, incorrectMax)
     return (correctMin, incorrectMax)
 
 def getThresholdForValue(value):
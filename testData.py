@@ -1,33 +1,47 @@
 import csv
+import io
 import random
 
+DATASET_PATH = "dataset1.csv"
+COMPANIES_PATH = "companies.txt"
+# (training, testing) dictionaries, read from DATASET_PATH the first time they're asked for
+DATA = None
+
+# Rows alternate between a training and a testing (company, website) pair
 def getData():
-    with open("dataset1.csv") as f:
-        for line in f:
-            arr = line.replace("\r", "").split(",")[:-1]
+    global DATA
+    if DATA is None:
         compToWebTrain = {}
         compToWebTest = {}
-        for i in range(len(arr)):
-            if i % 4 == 0:
-                compToWebTrain[arr[i]] = arr[i+1].strip()
-            if i % 4 == 2:
-                compToWebTest[arr[i]] = arr[i+1].strip()
-        return (compToWebTrain, compToWebTest)
+        # the file uses bare \r line endings, universal newline mode lets csv see each row
+        with open(DATASET_PATH, "rU") as f:
+            for i, row in enumerate(csv.reader(f)):
+                if i % 2 == 0:
+                    compToWebTrain[row[0]] = row[1].strip()
+                else:
+                    compToWebTest[row[0]] = row[1].strip()
+        DATA = (compToWebTrain, compToWebTest)
+    return DATA
+
+def getTrainingDictionary():
+    return getData()[0]
+
+def getTestingDictionary():
+    return getData()[1]
 
-companyToWebsiteTrainingDictionary, companyToWebsiteTestingDictionary = getData()
+# company names in COMPANIES_PATH, read the first time getNCompanies is called
+COMPANIES = None
 
-# def getNCompanies(n=20):
-#     n = 20 if n < 1 or n > 947 else int(n)
-#     with open("companies.txt") as f:
-#         s = random.sample(range(1, 947), n)
-#         i = 1
-#         arr = []
-#         for line in f:
-#             if i in s:
-#                 data = line.strip('\n').replace("\x00", "")[:-1]
-#                 if data[0] == "\"":
-#                     data = data[1:len(data)-1]
-#                 arr.append(data)
-#             i += 1
-#     return arr
+def getCompanies():
+    global COMPANIES
+    if COMPANIES is None:
+        # the file is UTF-16 with some names wrapped in quotes
+        with io.open(COMPANIES_PATH, encoding="utf-16") as f:
+            COMPANIES = [line.strip().strip('"').encode("utf-8") for line in f if line.strip()]
+    return COMPANIES
 
+# Returns n random company names from COMPANIES_PATH
+def getNCompanies(n=20):
+    companies = getCompanies()
+    n = 20 if n < 1 else int(n)
+    return random.sample(companies, min(n, len(companies)))